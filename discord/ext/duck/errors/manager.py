@@ -4,9 +4,11 @@ import sys
 import asyncio
 import datetime
 import os
+import time
 import traceback
+from collections import OrderedDict
 from logging import getLogger
-from typing import Tuple, Optional, Dict, List, Generator, Any, TypedDict, NamedTuple, TypeVar
+from typing import ClassVar, Tuple, Optional, Dict, List, Generator, Any, TypedDict, NamedTuple, TypeVar
 
 import aiohttp
 import discord
@@ -45,13 +47,23 @@ class CommandErrorSettings(NamedTuple):
 
 log = getLogger(__name__)
 
+MAX_TRACEBACKS: int = 1000
+TRACEBACK_CACHE_SIZE: int = 128
+
+# Discord's limits for the embeds of a single message.
+MAX_EMBEDS_PER_MESSAGE: int = 10
+MAX_EMBED_CHARACTERS: int = 6000
+
+_shared_session: Optional[aiohttp.ClientSession] = None
+
 
 class ErrorManager:
     """A simple exception handler that sends all exceptions to a error
     Webhook and then logs them to the console.
 
-    This class handles cooldowns with a simple lock, so you don't have to worry about
-    rate limiting your webhook and getting banned :).
+    This class handles cooldowns with a single background task that releases the
+    queued errors one by one, so you don't have to worry about rate limiting your
+    webhook and getting banned :).
 
     .. note::
 
@@ -65,7 +77,9 @@ class ErrorManager:
     webhook_url: str
         A valid webhook URL.
     session: aiohttp.ClientSession
-        The aiohttp session to send the errors to.
+        The aiohttp session to send the errors to. This should be a long-lived
+        session (like the bot's own) so the webhook connections are reused, see
+        :meth:`shared` if you don't have one.
     hijack_bot_on_error: bool = False
         Whether the default bot's on_error should be overwritten.
     on_command_error_settings: CommandErrorSettings = CommandErrorSettings(hijack=False)
@@ -84,9 +98,11 @@ class ErrorManager:
         The bot instance.
     cooldown: datetime.timedelta
         The cooldown between sending errors. This defaults to 5 seconds.
-    errors: Dict[str, Dict[str, Any]]
-        A mapping of tracebacks to their error information, this
-        is all the errors that are waiting to be sent (if any).
+    errors: Dict[str, Tuple[TracebackData, int]]
+        A mapping of tracebacks to the first error packet seen for them and
+        how many times they occurred, this is all the errors that are waiting
+        to be sent (if any). Holds at most ``MAX_TRACEBACKS`` entries, any new
+        tracebacks past that are dropped until some are released.
     code_blocker: str
         The code blocker used to format Discord codeblocks.
         A standard .format(tb) call is used to format this.
@@ -98,15 +114,33 @@ class ErrorManager:
 
     __slots__: Tuple[str, ...] = (
         "bot",
-        "cooldown",
-        "_lock",
+        "_cooldown",
+        "_cooldown_s",
         "_most_recent",
+        "_queue",
+        "_drain_task",
         "errors",
+        "_dropped",
         "code_blocker",
         "error_webhook",
-        "oce_settings",
+        "_oce_settings",
+        "_check_locals",
+        "_ignored_errors",
+        "_cached_user_id",
+        "_cached_kwargs",
+        "_cached_author_kwargs",
+        "_cwd",
+        "_traceback_cache",
     )
 
+    _FIELD_LABELS: ClassVar[Dict[str, str]] = {
+        "time": "**Time**",
+        "author": "**Author**",
+        "guild": "**Guild**",
+        "channel": "**Channel**",
+        "command": "**Command**",
+    }
+
     def __init__(
         self,
         bot: commands.Bot,
@@ -117,18 +151,35 @@ class ErrorManager:
         on_command_error_settings: CommandErrorSettings = CommandErrorSettings(hijack=False),
         cooldown: datetime.timedelta = datetime.timedelta(seconds=5),
     ) -> None:
+        if session.closed:
+            raise ValueError("The session passed to ErrorManager is closed.")
+
         self.bot: commands.Bot = bot
-        self.cooldown: datetime.timedelta = cooldown
+        self._cooldown: datetime.timedelta = cooldown
+        self._cooldown_s: float = cooldown.total_seconds()
+        self._most_recent: float = 0.0  # time.monotonic() of the last release
 
-        self._lock: asyncio.Lock = asyncio.Lock()
-        self._most_recent: Optional[datetime.datetime] = None
+        # Every pending traceback is queued once, so this also bounds self.errors.
+        self._queue: asyncio.Queue[str] = asyncio.Queue(maxsize=MAX_TRACEBACKS)
+        self._drain_task: Optional[asyncio.Task[None]] = None
 
-        self.errors: Dict[str, List[TracebackData]] = {}
+        self._cwd: str = os.getcwd()
+        self._traceback_cache: OrderedDict[Tuple[Any, ...], str] = OrderedDict()
+
+        self.errors: Dict[str, Tuple[TracebackData, int]] = {}
+        self._dropped: int = 0
         self.code_blocker: str = "```py\n{}```"
         self.error_webhook: discord.Webhook = discord.Webhook.from_url(
             webhook_url, session=session, bot_token=bot.http.token
         )
-        self.oce_settings = on_command_error_settings
+        self._oce_settings: CommandErrorSettings = on_command_error_settings
+        self._check_locals: bool = on_command_error_settings.check_for_local_error_handlers
+        self._ignored_errors: Tuple[type[commands.CommandError], ...] = on_command_error_settings.ignored_errors
+
+        # Webhook and embed author kwargs, rebuilt only when the bot user changes.
+        self._cached_user_id: Optional[int] = None
+        self._cached_kwargs: Dict[str, Any] = {"content": "<@349373972103561218>"}
+        self._cached_author_kwargs: Optional[Dict[str, Any]] = None
 
         if hijack_bot_on_error:
             bot.on_error = self.bot_on_error
@@ -136,8 +187,65 @@ class ErrorManager:
         if on_command_error_settings.hijack:
             bot.on_command_error = self.bot_command_error
 
+    @property
+    def cooldown(self) -> datetime.timedelta:
+        return self._cooldown
+
+    @cooldown.setter
+    def cooldown(self, value: datetime.timedelta) -> None:
+        self._cooldown = value
+        self._cooldown_s = value.total_seconds()
+
+    @property
+    def oce_settings(self) -> CommandErrorSettings:
+        return self._oce_settings
+
+    @oce_settings.setter
+    def oce_settings(self, value: CommandErrorSettings) -> None:
+        self._oce_settings = value
+        self._check_locals = value.check_for_local_error_handlers
+        self._ignored_errors = value.ignored_errors
+
+    @classmethod
+    async def shared(cls, bot: commands.Bot, *, webhook_url: str, **kwargs: Any) -> ErrorManager:
+        """|coro|
+
+        Creates an error manager that uses a session shared by all managers
+        created with this method, instead of one you pass yourself.
+
+        The session is created on the first call and kept open, so the webhook
+        keeps its connections alive across error sends. Close it with
+        :meth:`close_shared` when the bot is closing.
+
+        Parameters
+        ----------
+        bot: commands.Bot
+            The bot instance.
+        webhook_url: str
+            A valid webhook URL.
+        **kwargs
+            Any other keyword arguments accepted by :class:`ErrorManager`, except ``session``.
+        """
+        global _shared_session
+        if _shared_session is None or _shared_session.closed:
+            _shared_session = aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit_per_host=64))
+
+        return cls(bot, webhook_url=webhook_url, session=_shared_session, **kwargs)
+
+    @classmethod
+    async def close_shared(cls) -> None:
+        """|coro|
+
+        Closes the session shared by the error managers created with :meth:`shared`.
+        Calling :meth:`shared` again creates a new one.
+        """
+        global _shared_session
+        session, _shared_session = _shared_session, None
+        if session is not None and not session.closed:
+            await session.close()
+
     async def bot_command_error(self, ctx: commands.Context[commands.Bot], error: commands.CommandError) -> None:
-        if self.oce_settings.check_for_local_error_handlers:
+        if self._check_locals:
             if ctx.bot.extra_events.get("on_command_error", None):
                 return
 
@@ -149,7 +257,7 @@ class ErrorManager:
             if cog and cog.has_error_handler():
                 return
 
-        if isinstance(error, self.oce_settings.ignored_errors):
+        if isinstance(error, self._ignored_errors):
             return
         elif isinstance(error, commands.CommandInvokeError):
             await self.add_error(error=error.original, ctx=ctx)
@@ -162,29 +270,78 @@ class ErrorManager:
             await self.add_error(error=error)
 
     def _yield_code_chunks(self, iterable: str, *, chunksize: int = 2000) -> Generator[str, None, None]:
-        cbs = len(self.code_blocker) - 2  # code blocker size
-
-        for i in range(0, len(iterable), chunksize - cbs):
-            yield self.code_blocker.format(iterable[i : i + chunksize - cbs])
-
-    async def release_error(self, traceback: str, packet: TracebackData) -> None:
-        """|coro|
-
-        Releases an error to the webhook and logs it to the console. It is not recommended
-        to call this yourself, call :meth:`add_error` instead.
-
-        Parameters
-        ----------
-        traceback: str
-            The traceback of the error.
-        packet: dict
-            The additional information about the error.
-        """
-        log.error("Releasing error to log", exc_info=packet["exception"])
-
+        code_blocker = self.code_blocker
+        step = chunksize - (len(code_blocker) - 2)  # minus the code blocker size
+
+        for i in range(0, len(iterable), step):
+            yield code_blocker.format(iterable[i : i + step])
+
+    @staticmethod
+    def _traceback_key(error: BaseException) -> Optional[Tuple[Any, ...]]:
+        # Everything that ends up in the formatted traceback: the exception types,
+        # messages, notes and the exact position in every frame, of the whole chain.
+        key: List[Any] = []
+        pending: List[BaseException] = [error]
+        seen: set[int] = set()
+        while pending:
+            exc = pending.pop()
+            if id(exc) in seen:
+                continue
+            seen.add(id(exc))
+
+            try:
+                message = str(exc)
+            except Exception:
+                return None
+            key.extend((type(exc), message, exc.__suppress_context__, tuple(getattr(exc, "__notes__", ()))))
+
+            tb = exc.__traceback__
+            while tb is not None:
+                key.append((tb.tb_frame.f_code, tb.tb_lasti))
+                tb = tb.tb_next
+            key.append(None)  # end of this exception's frames
+
+            if exc.__cause__ is not None:
+                pending.append(exc.__cause__)
+            if exc.__context__ is not None:
+                pending.append(exc.__context__)
+            if isinstance(exc, BaseExceptionGroup):
+                pending.extend(exc.exceptions)
+
+        return tuple(key)
+
+    def _get_traceback(self, error: BaseException) -> str:
+        # Formatting walks every frame and reads its source, so errors raised
+        # over and over from the same place reuse the first formatted traceback.
+        key = self._traceback_key(error)
+        if key is None:
+            return self._format_traceback(error)
+
+        cache = self._traceback_cache
+        traceback_string = cache.get(key)
+        if traceback_string is not None:
+            cache.move_to_end(key)
+            return traceback_string
+
+        traceback_string = cache[key] = self._format_traceback(error)
+        if len(cache) > TRACEBACK_CACHE_SIZE:
+            cache.popitem(last=False)
+        return traceback_string
+
+    def _format_traceback(self, error: BaseException) -> str:
+        # Replaced in the whole text, not only in frame filenames, so paths in
+        # exception messages (e.g. FileNotFoundError) don't leak the cwd either.
+        return "".join(traceback.format_exception(type(error), error, error.__traceback__)).replace(self._cwd, "CWD")
+
+    async def _ensure_webhook(self) -> discord.Webhook:
+        # Webhooks made from a URL are partial, fetch it once and keep the full one.
         if self.error_webhook.is_partial():
             self.error_webhook = await self.error_webhook.fetch()
+        return self.error_webhook
 
+    def _build_error_embed(
+        self, packet: TracebackData, occurrences: int, author_kwargs: Optional[Dict[str, Any]]
+    ) -> discord.Embed:
         fmt = {
             "time": discord.utils.format_dt(packet["time"]),
         }
@@ -226,41 +383,112 @@ class ErrorManager:
         embed = discord.Embed(title=f"An error has occurred in {display}", timestamp=packet["time"])
         embed.add_field(
             name="Metadata",
-            value="\n".join([f"**{k.title()}**: {v}" for k, v in fmt.items()]),
+            value="\n".join([f"{self._FIELD_LABELS[k]}: {v}" for k, v in fmt.items()]),
         )
 
-        kwargs: Dict[str, Any] = {}
-        if self.bot.user:
-            kwargs["username"] = self.bot.user.display_name
-            kwargs["avatar_url"] = self.bot.user.display_avatar.url
+        embed.add_field(name="Occurrences", value=f"{occurrences} (+{self._dropped} dropped globally)")
+
+        if author_kwargs:
+            embed.set_author(**author_kwargs)
+
+        return embed
+
+    async def release_error(self, traceback: str, packet: TracebackData, *, occurrences: int = 1) -> None:
+        """|coro|
+
+        Releases an error to the webhook and logs it to the console. It is not recommended
+        to call this yourself, call :meth:`add_error` instead.
 
-            embed.set_author(name=str(self.bot.user), icon_url=self.bot.user.display_avatar.url)
+        Parameters
+        ----------
+        traceback: str
+            The traceback of the error.
+        packet: dict
+            The additional information about the error.
+        occurrences: int = 1
+            How many times this traceback was raised.
+        """
+        log.error("Releasing error to log", exc_info=packet["exception"])
 
-        kwargs["content"] = "<@349373972103561218>"
+        user = self.bot.user
+        if user and user.id != self._cached_user_id:
+            avatar_url = user.display_avatar.url
+            self._cached_user_id = user.id
+            self._cached_kwargs = {
+                "username": user.display_name,
+                "avatar_url": avatar_url,
+                "content": "<@349373972103561218>",
+            }
+            self._cached_author_kwargs = {"name": str(user), "icon_url": avatar_url}
+        kwargs = self._cached_kwargs
+        author_kwargs = self._cached_author_kwargs
 
-        webhook = self.error_webhook
-        if webhook.is_partial():
-            self.error_webhook = webhook = await self.error_webhook.fetch()
+        embed = self._build_error_embed(packet, occurrences, author_kwargs)
+        webhook = await self._ensure_webhook()
 
-        code_chunks = list(self._yield_code_chunks(traceback))
+        code_chunks = self._yield_code_chunks(traceback)
 
-        embed.description = code_chunks.pop(0)
-        await webhook.send(embed=embed, **kwargs)
+        embed.description = next(code_chunks)
 
-        embeds: List[discord.Embed] = []
+        # The first message carries the metadata embed along with as many code chunks
+        # as fit in Discord's per-message embed limits.
+        embeds: List[discord.Embed] = [embed]
+        size = len(embed)
         for entry in code_chunks:
             embed = discord.Embed(description=entry)
-            if self.bot.user:
-                embed.set_author(name=str(self.bot.user), icon_url=self.bot.user.display_avatar.url)
-
-            embeds.append(embed)
+            if author_kwargs:
+                embed.set_author(**author_kwargs)
 
-            if len(embeds) == 10:
+            embed_size = len(embed)
+            if len(embeds) == MAX_EMBEDS_PER_MESSAGE or size + embed_size > MAX_EMBED_CHARACTERS:
                 await webhook.send(embeds=embeds, **kwargs)
                 embeds = []
+                size = 0
+
+            embeds.append(embed)
+            size += embed_size
+
+        await webhook.send(embeds=embeds, **kwargs)
+
+    async def _drain(self) -> None:
+        # The only consumer of the queue. Errors are released one at a time with
+        # the cooldown in between, so MANY errors raised VERY fast won't get
+        # the webhook rate limited.
+        while True:
+            traceback_string = await self._queue.get()
+            if traceback_string not in self.errors:
+                continue
+
+            delta = time.monotonic() - self._most_recent
+            if delta < self._cooldown_s:
+                log.debug("Waiting %s seconds to release error", self._cooldown_s - delta)
+                await asyncio.sleep(self._cooldown_s - delta)
+
+            # Taken out only now, so repeats raised during the cooldown are counted in this
+            # release, and ones raised while it's being sent are queued for the next one.
+            packet, occurrences = self.errors.pop(traceback_string)
+            self._most_recent = time.monotonic()
+            try:
+                await self.release_error(traceback_string, packet, occurrences=occurrences)
+            except Exception:
+                log.exception("Failed to release error to the webhook")
+
+    async def close(self) -> None:
+        """|coro|
+
+        Stops the background task that releases errors. Call this when the bot is
+        closing, for example in :meth:`commands.Bot.close`. Pending errors stay queued,
+        and are released if a later :meth:`add_error` starts the task again.
+        """
+        task, self._drain_task = self._drain_task, None
+        if task is None or task.done():
+            return
 
-        if embeds:
-            await webhook.send(embeds=embeds, **kwargs)
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
 
     async def add_error(
         self,
@@ -281,6 +509,9 @@ class ErrorManager:
         ctx: Optional[commands.Context | discord.Interaction]
             The invocation context or interaction of the error, if any.
         """
+        if isinstance(error, self._ignored_errors):
+            return
+
         log.info('Adding error "%s" to log.', str(error))
 
         packet: TracebackData = {
@@ -304,36 +535,22 @@ class ErrorManager:
                 "channel": ctx.channel_id,
             }
 
-        traceback_string = "".join(traceback.format_exception(type(error), error, error.__traceback__)).replace(
-            os.getcwd(), "CWD"
-        )
-        current = self.errors.get(traceback_string)
+        traceback_string = self._get_traceback(error)
+        entry = self.errors.get(traceback_string)
 
-        if current:
-            self.errors[traceback_string].append(packet)
-        else:
-            self.errors[traceback_string] = [packet]
-
-        async with self._lock:
-            # I want all other errors to be released after this one, which is why
-            # lock is here. If you have code that calls MANY errors VERY fast,
-            # this will rate limit the webhook. We don't want that.
-
-            if not self._most_recent:
-                self._most_recent = discord.utils.utcnow()
-                await self.release_error(traceback_string, packet)
-            else:
-                time_between = packet["time"] - self._most_recent
-
-                if time_between > self.cooldown:
-                    self._most_recent = discord.utils.utcnow()
-                    return await self.release_error(traceback_string, packet)
-                else:  # We have to wait
-                    log.debug(
-                        "Waiting %s seconds to release error",
-                        time_between.total_seconds(),
-                    )
-                    await asyncio.sleep(time_between.total_seconds())
-
-                    self._most_recent = discord.utils.utcnow()
-                    return await self.release_error(traceback_string, packet)
+        if entry:
+            # Already waiting to be released, the release will pick up the new count.
+            self.errors[traceback_string] = (entry[0], entry[1] + 1)
+            return
+
+        try:
+            self._queue.put_nowait(traceback_string)
+        except asyncio.QueueFull:
+            self._dropped += 1
+            log.debug("Dropping error, %s tracebacks are already waiting to be released", MAX_TRACEBACKS)
+            return
+
+        self.errors[traceback_string] = (packet, 1)
+
+        if self._drain_task is None or self._drain_task.done():
+            self._drain_task = asyncio.create_task(self._drain())
@@ -21,6 +21,7 @@ class WebserverCog(commands.Cog, BaseWebserver):
         await bot.add_cog(MyWSCog())
     """
 
+    __runner_auto_start__: bool
     __runner_port__: int
     __runner_host__: str
 
@@ -33,18 +34,25 @@ class WebserverCog(commands.Cog, BaseWebserver):
                 '\n    """You are responsible for calling (async) self.start(port=...) when using this."""\n\n'
             )
             raise RuntimeError(message)
+        cls.__runner_auto_start__ = auto_start
         cls.__runner_port__ = port
         cls.__runner_host__ = host
         return super().__init_subclass__()
 
     async def cog_load(self) -> None:
-        try:
-            await self.start(host=self.__runner_host__, port=self.__runner_port__)
-        finally:
-            return await super().cog_load()
+        if self.__runner_auto_start__:
+            try:
+                await self.start(host=self.__runner_host__, port=self.__runner_port__)
+            except BaseException:
+                # discord.py won't call cog_unload for a cog that failed to load.
+                await self.close()
+                raise
+        await super().cog_load()
 
     async def cog_unload(self) -> None:
         try:
-            await self.close()
+            # With auto_start=False the server may never have been started.
+            if self._webserver is not None:
+                await self.close()
         finally:
-            return await super().cog_unload()
+            await super().cog_unload()
@@ -4,9 +4,9 @@ from typing import (
     TYPE_CHECKING,
     Any,
     Callable,
-    List,
+    ClassVar,
+    Dict,
     Literal,
-    NamedTuple,
     Optional,
     Tuple,
     TypeVar,
@@ -20,12 +20,6 @@ __all__: Tuple[str, ...] = ("BaseWebserver", "route")
 FuncT = TypeVar("FuncT", bound="Callable[..., Any]")
 
 
-class Route(NamedTuple):
-    name: str
-    method: str
-    func: Callable[..., Any]
-
-
 def route(method: Literal["get", "post", "put", "patch", "delete"], request_path: str) -> Callable[[FuncT], FuncT]:
     def decorator(func: FuncT) -> FuncT:
         actual = func
@@ -42,25 +36,48 @@ def route(method: Literal["get", "post", "put", "patch", "delete"], request_path
 
 
 class BaseWebserver:
+    # The request paths, methods and attribute names of every route (in parallel),
+    # collected once per class.
+    _route_paths: ClassVar[Tuple[str, ...]] = ()
+    _route_methods: ClassVar[Tuple[str, ...]] = ()
+    _route_attrs: ClassVar[Tuple[str, ...]] = ()
+
+    def __init_subclass__(cls, **kwargs: Any) -> None:
+        super().__init_subclass__(**kwargs)
+
+        specs: Dict[str, Tuple[str, str]] = {}
+        for klass in reversed(cls.__mro__):
+            for attr_name, value in vars(klass).items():
+                if isinstance(value, staticmethod):
+                    value = value.__func__
+                name: Optional[str] = getattr(value, "__ipc_route_path__", None)
+                if name is None:
+                    # A subclass may override a route with a plain attribute.
+                    specs.pop(attr_name, None)
+                    continue
+                specs[attr_name] = (name, value.__ipc_method__)  # type: ignore
+
+        # Keep the same (alphabetical) order dir() used to give.
+        attrs = tuple(sorted(specs))
+        cls._route_attrs = attrs
+        cls._route_paths = tuple(specs[attr_name][0] for attr_name in attrs)
+        cls._route_methods = tuple(specs[attr_name][1] for attr_name in attrs)
+
     @property
     def logger(self):
         return logging.getLogger(f"{__name__}.{self.__class__.__name__}")
 
     def __init__(self):
-        self.routes: List[Route] = []
-
         self.app: web.Application = web.Application()
         self._runner = web.AppRunner(self.app)
         self._webserver: Optional[web.TCPSite] = None
 
-        for attr in map(lambda x: getattr(self, x, None), dir(self)):
-            if attr is None:
-                continue
-            if (name := getattr(attr, "__ipc_route_path__", None)) is not None:
-                route: str = attr.__ipc_method__
-                self.routes.append(Route(func=attr, name=name, method=route))
-
-        self.app.add_routes([web.route(x.method, x.name, x.func) for x in self.routes])
+        self.app.add_routes(
+            [
+                web.route(method, name, getattr(self, attr_name))
+                for name, method, attr_name in zip(self._route_paths, self._route_methods, self._route_attrs)
+            ]
+        )
 
     async def start(self, *, host: str = "localhost", port: int):
         self.logger.debug(f"Starting {type(self).__name__} runner.")
@@ -68,11 +85,10 @@ class BaseWebserver:
         self.logger.debug(f"Starting {type(self).__name__} webserver.")
         self._webserver = web.TCPSite(self._runner, host=host, port=port)
         await self._webserver.start()
-        self._webserver.start
 
     async def close(self):
         self.logger.debug(f"Cleaning up after {type(self).__name__}.")
+        # Cleaning up the runner also stops the webserver, stopping it again
+        # afterwards raises as it's no longer registered in the runner.
         await self._runner.cleanup()
-        if self._webserver:
-            self.logger.debug(f"Closing {type(self).__name__} webserver.")
-            await self._webserver.stop()
+        self._webserver = None
@@ -1,21 +1,17 @@
 from setuptools import setup
 
-version = "1.0b"
-
-# append version identifier based on commit count
-try:
-    import subprocess
-
-    p = subprocess.Popen(["git", "rev-list", "--count", "HEAD"], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-    out, err = p.communicate()
-    if out:
-        version += out.decode("utf-8").strip()
-    p = subprocess.Popen(["git", "rev-parse", "--short", "HEAD"], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-    out, err = p.communicate()
-    if out:
-        version += "+g" + out.decode("utf-8").strip()
-except Exception:
-    pass
+
+def version_scheme(version) -> str:
+    # 1.0b<commit count>, read from git by setuptools-scm when the sdist/wheel is built.
+    # The count is commits since the latest tag, or all commits while the repo has none,
+    # so bump the base version above whenever a tag is pushed.
+    return f"1.0b{version.distance or ''}"
+
+
+def local_scheme(version) -> str:
+    # +g<short hash>, version.node is "g" followed by the full commit hash.
+    return f"+{version.node[:8]}" if version.node else ""
+
 
 readme = ""
 with open("README.md") as f:
@@ -31,7 +27,11 @@ setup(
     name="discord-ext-duck",
     author="LeoCx1000",
     url="https://github.com/DuckBot-Discord/ext.duck",
-    version=version,
+    use_scm_version={
+        "version_scheme": version_scheme,
+        "local_scheme": local_scheme,
+        "fallback_version": "1.0b",
+    },
     packages=packages,
     license="Mozilla Public License v2.0",
     description="Utility extensions for DuckBot and it's sister projects.",